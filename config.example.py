@@ -28,12 +28,27 @@ DATABASE_ENCRYPTION_KEY = "change_this_to_secure_password_123"
 # ======================
 # ПУТИ И ФАЙЛЫ
 # ======================
-# Директория для хранения файлов TDLib
-FILES_DIRECTORY = Path("tdlib_files")
+# Директория для хранения файлов TDLib (сессия, кэш)
+# При смене директории TDLib начнёт с чистого листа и потребуется
+# повторный вход - перенесите содержимое старой директории вручную.
+# Можно указать tmpfs (например, Path("/dev/shm/tdlib_data") на Linux):
+# TDLib пишет туда заметно быстрее, но при перезагрузке кэш и сессия
+# теряются и потребуется повторный вход
+FILES_DIRECTORY = Path("tdlib_data")
 
 # База данных для хранения удалённых/отредактированных сообщений
 MESSAGE_DATABASE = Path("messages_backup.db")
 
+# Режим синхронизации SQLite для базы сообщений (применяется, только если
+# MessageDatabase поддерживает apply_pragmas, иначе в лог пишется предупреждение):
+# "FULL" - fsync на каждый коммит, максимальная надёжность
+# "NORMAL" - без fsync на коммит; при отключении питания могут
+#            потеряться последние транзакции, но файл не повредится
+# "OFF" - самый быстрый, при сбое ОС база может быть повреждена
+# Повреждённая база не удаляется автоматически: клиент не запустится,
+# а файл останется для ручного восстановления (sqlite3 ... ".recover")
+SQLITE_SYNCHRONOUS = "NORMAL"
+
 # Логи
 LOG_FILE = Path("jirgram.log")
 LOG_LEVEL = "INFO"  # DEBUG, INFO, WARNING, ERROR, CRITICAL
@@ -47,6 +62,12 @@ GHOST_MODE_ENABLED = False
 # Anti-Delete - сохраняет удалённые сообщения
 ANTI_DELETE_ENABLED = True
 
+# ID чатов, сообщения из которых не сохраняются (боты, большие каналы)
+IGNORED_CHATS = []
+
+# Если список не пуст - сохранять сообщения только из этих чатов
+ONLY_CHATS = []
+
 # Save Edit History - сохраняет историю редактирования
 SAVE_EDIT_HISTORY = True
 
@@ -67,5 +88,9 @@ PROXY_PORT = 1080
 PROXY_USERNAME = ""
 PROXY_PASSWORD = ""
 
+# Телеметрия: раз в минуту пишет в лог задержку event loop и время
+# обработчиков (loop опрашивается 10 раз в секунду)
+LAG_TELEMETRY = False
+
 # Создание необходимых директорий
 FILES_DIRECTORY.mkdir(exist_ok=True)
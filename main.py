@@ -5,39 +5,357 @@ Based on TDLib with ghost mode, anti-delete, and customization features
 """
 
 import asyncio
+import atexit
+import functools
 import json
 import logging
+import logging.handlers
+import operator
+import queue
 import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
 from pathlib import Path
+from types import SimpleNamespace
 
-try:
-    from telegram.client import Telegram
-    from telegram.text import Spoiler, Bold, Italic
-except ImportError:
-    print("Error: python-telegram library not installed")
-    print("Install it with: pip install python-telegram")
-    sys.exit(1)
 
-# Import local modules
-try:
+logger = logging.getLogger(__name__)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records untouched so all formatting happens on the listener thread"""
+
+    def prepare(self, record):
+        # Records never leave the process, so they need no pickling. The
+        # message is only built from record.args on the listener thread, so
+        # an argument mutated after the call is logged in its later state;
+        # pass values, not objects that keep changing.
+        return record
+
+
+# Set up by _setup_logging(): handlers only enqueue, a listener thread formats and writes
+_log_stream = None
+_log_queue_handler = None
+_log_listener = None
+
+
+def _setup_logging():
+    """Route log records through a queue to a listener thread"""
+    global _log_stream, _log_queue_handler, _log_listener
+    log_queue = queue.SimpleQueue()
+    _log_stream = logging.StreamHandler()
+    _log_stream.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    _log_listener = logging.handlers.QueueListener(log_queue, _log_stream, respect_handler_level=True)
+
+    _log_queue_handler = _DeferredQueueHandler(log_queue)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(_log_queue_handler)
+    _log_listener.start()
+    atexit.register(_stop_logging)
+
+
+def _stop_logging():
+    """Write out queued log records and switch back to writing records directly"""
+    global _log_listener
+    if _log_listener is not None:
+        # Attach the stream handler before detaching the queue so no record is dropped
+        root_logger = logging.getLogger()
+        root_logger.addHandler(_log_stream)
+        root_logger.removeHandler(_log_queue_handler)
+        _log_listener.stop()
+        _log_listener = None
+
+
+# JSON codec for TDLib and the writer process, see _use_orjson()
+_json_dumps = json.dumps
+_json_loads = json.loads
+
+
+def _use_orjson() -> bool:
+    """Switch the JSON codec to orjson when it is installed"""
+    global _json_dumps, _json_loads
+    try:
+        import orjson
+    except ImportError:
+        return False
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+    _json_dumps, _json_loads = dumps, orjson.loads
+    return True
+
+# Accessors for keys TDLib always sends
+_GET_TYPE = operator.itemgetter('@type')
+_GET_MSG = operator.itemgetter('message')
+_GET_CONTENT = operator.itemgetter('content')
+
+# Update types handled as new messages
+_NEW_MSG_TYPES = frozenset({'updateNewMessage'})
+
+# Text extractors keyed by message content @type
+_EMPTY = {}
+_TYPE_FMT = '[{}]'
+
+
+def _caption(content: dict) -> str:
+    return content.get('caption', _EMPTY).get('text') or _TYPE_FMT.format(_GET_TYPE(content))
+
+
+_EXTRACTORS = {
+    'messageText': lambda content: content.get('text', _EMPTY).get('text', ''),
+    'messagePhoto': _caption,
+    'messageVideo': _caption,
+    'messageDocument': _caption,
+    'messageAudio': _caption,
+    'messageAnimation': _caption,
+    'messageVoiceNote': _caption,
+}
+
+# Anti-delete write batching
+BATCH_SIZE = 128
+FLUSH_INTERVAL = 2.0
+
+# Deletion updates arriving within this window are applied together
+DELETE_DEBOUNCE = 0.05
+
+# Loop lag telemetry
+LAG_PROBE_INTERVAL = 0.1
+TELEMETRY_LOG_INTERVAL = 60.0
+
+# TDLib files directory used before FILES_DIRECTORY was configurable
+DEFAULT_FILES_DIRECTORY = Path('tdlib_data')
+
+
+def _has_tdlib_data(files_directory: Path) -> bool:
+    """Check for a TDLib session (python-telegram keeps it under database/)"""
+    return any((files_directory / 'database').glob('td*.binlog'))
+
+# Optional settings: field name -> (config.py name, default)
+_CONFIG_DEFAULTS = {
+    'ghost_mode': ('GHOST_MODE', True),
+    'hide_online': ('HIDE_ONLINE', True),
+    'hide_typing': ('HIDE_TYPING', True),
+    'hide_read': ('HIDE_READ', True),
+    'save_deleted': ('SAVE_DELETED_MESSAGES', True),
+    'sqlite_synchronous': ('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'files_directory': ('FILES_DIRECTORY', DEFAULT_FILES_DIRECTORY),
+    'ignored_chats': ('IGNORED_CHATS', ()),
+    'only_chats': ('ONLY_CHATS', ()),
+    'lag_telemetry': ('LAG_TELEMETRY', False),
+}
+
+
+@dataclass(frozen=True)
+class ClientConfig:
+    """Immutable snapshot of config.py, taken once at startup"""
+
+    __slots__ = (
+        'api_id', 'api_hash', 'phone', 'encryption_key',
+        *_CONFIG_DEFAULTS,
+    )
+
+    api_id: int
+    api_hash: str
+    phone: str
+    encryption_key: str
+
+    # Feature flags
+    ghost_mode: bool
+    hide_online: bool
+    hide_typing: bool
+    hide_read: bool
+    save_deleted: bool
+
+    # Anti-delete chat filters (empty only_chats means every chat)
+    ignored_chats: frozenset
+    only_chats: frozenset
+
+    # Storage
+    sqlite_synchronous: str
+    files_directory: Path
+
+    # Diagnostics
+    lag_telemetry: bool
+
+    @classmethod
+    def from_module(cls, module) -> 'ClientConfig':
+        """Build a snapshot from a config module"""
+        options = {
+            field: getattr(module, name, default)
+            for field, (name, default) in _CONFIG_DEFAULTS.items()
+        }
+        options['ignored_chats'] = frozenset(options['ignored_chats'])
+        options['only_chats'] = frozenset(options['only_chats'])
+
+        return cls(
+            api_id=module.API_ID,
+            api_hash=module.API_HASH,
+            phone=module.PHONE,
+            encryption_key=module.ENCRYPTION_KEY,
+            **options,
+        )
+
+
+def _tune_database(db, synchronous: str) -> bool:
+    """Apply connection PRAGMAs to a message database, return False if it can't take them"""
+    # WAL lets readers proceed during a commit; with synchronous=NORMAL
+    # a WAL commit skips the fsync, so a power loss may drop the last
+    # few transactions but never corrupts the file. Use FULL to fsync
+    # every commit, OFF only if losing the backup DB is acceptable.
+    pragmas = {
+        'journal_mode': 'WAL',
+        'synchronous': synchronous,
+        'busy_timeout': '5000',
+        'temp_store': 'MEMORY',
+        'cache_size': '-65536',
+    }
+
+    apply_pragmas = getattr(db, 'apply_pragmas', None)
+    if apply_pragmas is None:
+        return False
+    apply_pragmas(pragmas)
+    return True
+
+
+# sqlite3 errors that mean the file itself is damaged. Other DatabaseErrors,
+# notably OperationalError (locked, unable to open), are not corruption.
+_CORRUPTION_ERRORS = ('file is not a database', 'malformed')
+
+
+# Messages are stored one row each rather than packed per batch: deletions
+# and edits address single messages, which a packed blob would turn into a
+# read-modify-write of the whole batch. The batch is still shipped to the
+# writer process as one serialized payload.
+async def _save_batch(handler, batch: list):
+    """Save a batch of messages one by one through an AntiDeleteHandler"""
+    for message in batch:
+        await handler.save_message(message)
+
+
+# Database, handler and event loop owned by the database writer process
+_writer_db = None
+_writer_handler = None
+_writer_loop = None
+
+
+def _db_worker_init(synchronous: str):
+    """Open a dedicated database connection in the writer process"""
     from modules.database import MessageDatabase
-    from modules.ghost_mode import GhostModeHandler
     from modules.anti_delete import AntiDeleteHandler
-    from modules.message_history import MessageHistoryHandler
-    import config
-except ImportError as e:
-    print(f"Error importing modules: {e}")
-    print("Make sure you have:")
-    print("  1. Created config.py from config.example.py")
-    print("  2. Created the 'modules' folder with required files")
-    sys.exit(1)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+
+    global _writer_db, _writer_handler, _writer_loop
+    _use_orjson()
+    _writer_db = MessageDatabase()
+    _tune_database(_writer_db, synchronous)
+    _writer_handler = AntiDeleteHandler(_writer_db)
+
+    # Reused for every batch instead of a new loop per asyncio.run()
+    _writer_loop = asyncio.new_event_loop()
+
+
+def _db_worker_save(payload: str):
+    """Save a serialized batch of messages in the writer process"""
+    _writer_loop.run_until_complete(_save_batch(_writer_handler, _json_loads(payload)))
+
+
+class _LagMonitor:
+    """
+    Event loop lag and handler latency telemetry.
+    Handler times are kept as power-of-two nanosecond buckets.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._loop = None
+        self._handle = None
+        self._expected = 0.0
+        self._last_report = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.probes = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.handler_times = defaultdict(Counter)
+
+    def record(self, name: str, elapsed_ns: int):
+        """Count one handler call in its latency bucket"""
+        if not self.enabled:
+            return
+        if self._loop is None:
+            self._start()
+        self.handler_times[name][elapsed_ns.bit_length()] += 1
+
+    def _start(self):
+        self._loop = asyncio.get_running_loop()
+        self._last_report = time.perf_counter()
+        self._schedule()
+
+    def _schedule(self):
+        self._expected = time.perf_counter() + LAG_PROBE_INTERVAL
+        self._handle = self._loop.call_later(LAG_PROBE_INTERVAL, self._probe)
+
+    def _probe(self):
+        now = time.perf_counter()
+        lag = max(0.0, now - self._expected)
+        self.probes += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+
+        if now - self._last_report >= TELEMETRY_LOG_INTERVAL:
+            self.report()
+            self._reset()
+            self._last_report = now
+
+        self._schedule()
+
+    def stop(self):
+        """Stop probing and log what was collected since the last report"""
+        self.enabled = False
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+            self.report()
+
+    def report(self):
+        """Log loop lag and handler latency since the last report"""
+        if self.probes:
+            logger.info(
+                "Event loop lag: avg %.2f ms, max %.2f ms",
+                self.total_lag / self.probes * 1000, self.max_lag * 1000,
+            )
+
+        for name, buckets in self.handler_times.items():
+            calls = sum(buckets.values())
+            seen = 0
+            for bucket in sorted(buckets):
+                seen += buckets[bucket]
+                if seen * 2 >= calls:
+                    median_us = (1 << bucket) / 1000
+                    break
+            logger.info(
+                "%s: %d calls, p50 < %.1f us, max < %.1f us",
+                name, calls, median_us, (1 << max(buckets)) / 1000,
+            )
+
+
+def _timed(handler):
+    """Record handler latency in the client's lag monitor"""
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(self, update):
+        start = time.perf_counter_ns()
+        try:
+            return await handler(self, update)
+        finally:
+            self._lag_monitor.record(name, time.perf_counter_ns() - start)
+
+    return wrapper
 
 
 class JirgramClient:
@@ -50,89 +368,343 @@ class JirgramClient:
     """
 
     def __init__(self):
+        # Local modules are imported here so that a failed configuration
+        # check in main() exits without loading them
+        import sqlite3
+
+        try:
+            from modules.database import MessageDatabase
+            from modules.ghost_mode import GhostModeHandler
+            from modules.anti_delete import AntiDeleteHandler
+            from modules.message_history import MessageHistoryHandler
+            import config
+        except ImportError as e:
+            print(f"Error importing modules: {e}")
+            print("Make sure you have:")
+            print("  1. Created config.py from config.example.py")
+            print("  2. Created the 'modules' folder with required files")
+            sys.exit(1)
+
         # Load configuration
-        self.api_id = config.API_ID
-        self.api_hash = config.API_HASH
-        self.phone = config.PHONE
-        self.encryption_key = config.ENCRYPTION_KEY
-
-        # Feature flags from config
-        self.ghost_mode_enabled = getattr(config, 'GHOST_MODE', True)
-        self.hide_online = getattr(config, 'HIDE_ONLINE', True)
-        self.hide_typing = getattr(config, 'HIDE_TYPING', True)
-        self.hide_read = getattr(config, 'HIDE_READ', True)
-        self.save_deleted = getattr(config, 'SAVE_DELETED_MESSAGES', True)
-
-        # Initialize components
-        self.db = MessageDatabase()
-        self.ghost_handler = GhostModeHandler(self.hide_online, self.hide_typing, self.hide_read)
+        self.cfg = ClientConfig.from_module(config)
+
+        # Initialize components. Anti-delete and edit history share one
+        # database: edits are matched against the stored original message.
+        #
+        # A corrupt database is fatal rather than recovered by deleting and
+        # recreating the file: it may hold the only copy of deleted messages,
+        # so it is left in place for manual recovery (sqlite3 .recover).
+        try:
+            self.db = MessageDatabase()
+            tuned = _tune_database(self.db, self.cfg.sqlite_synchronous)
+        except sqlite3.DatabaseError as e:
+            if isinstance(e, sqlite3.OperationalError) or not any(
+                    text in str(e) for text in _CORRUPTION_ERRORS):
+                raise
+            logger.critical(f"Message database is corrupt, refusing to start: {e}")
+            sys.exit(1)
+
+        # Reported once here; the writer process gets the same database class
+        if not tuned:
+            logger.warning(
+                f"MessageDatabase has no apply_pragmas(), SQLITE_SYNCHRONOUS="
+                f"{self.cfg.sqlite_synchronous!r} is not applied"
+            )
+
+        self.ghost_handler = GhostModeHandler(self.cfg.hide_online, self.cfg.hide_typing, self.cfg.hide_read)
         self.anti_delete_handler = AntiDeleteHandler(self.db)
         self.history_handler = MessageHistoryHandler(self.db)
 
+        # Messages waiting to be written in a single transaction, and
+        # batches handed to the writer process but not yet committed
+        self._pending_saves = []
+        self._inflight = set()
+        self._flush_task = None
+
+        # Handlers run on a dedicated event loop thread (see _start_loop);
+        # background tasks are referenced until done so they are not collected
+        self._loop = None
+        self._loop_thread = None
+        self._tasks = set()
+
+        self._db_pool = self._new_db_pool()
+
+        # Deleted message ids per (chat_id, is_permanent, from_cache)
+        self._pending_deletes = {}
+        self._delete_flush_handle = None
+
+        self._lag_monitor = _LagMonitor(self.cfg.lag_telemetry)
+
         self.tg = None
         self.is_running = False
 
+    def _new_db_pool(self):
+        """Start the database writer process"""
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # SQLite writes run in a separate process to keep the event loop free.
+        # Spawn rather than fork: TDLib threads are already running by the
+        # time the first batch is submitted.
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_db_worker_init,
+            initargs=(self.cfg.sqlite_synchronous,),
+        )
+
     def init_client(self):
         """Initialize TDLib Telegram client"""
+        # Deferred until needed: loads TDLib's native library
+        try:
+            from telegram.client import Telegram
+        except ImportError:
+            print("Error: python-telegram library not installed")
+            print("Install it with: pip install python-telegram")
+            sys.exit(1)
+
         logger.info("Initializing Telegram client...")
 
+        self._install_fast_json()
+
+        # Pointing TDLib at a new directory means a fresh session and a new
+        # login; once the configured directory has its own session, the old
+        # one is left alone (e.g. kept as a backup next to a tmpfs directory)
+        files_directory = Path(self.cfg.files_directory)
+        if (files_directory.resolve() != DEFAULT_FILES_DIRECTORY.resolve()
+                and _has_tdlib_data(DEFAULT_FILES_DIRECTORY)
+                and not _has_tdlib_data(files_directory)):
+            logger.warning(
+                f"Existing TDLib data found in '{DEFAULT_FILES_DIRECTORY}' but FILES_DIRECTORY is "
+                f"'{files_directory}'. Move the data there or set "
+                f"FILES_DIRECTORY = Path('{DEFAULT_FILES_DIRECTORY}') to keep the current session."
+            )
+
+        # The key is passed as-is: TDLib uses it directly as the database
+        # key, so hashing or otherwise transforming it here would make any
+        # existing tdlib_data unreadable
         self.tg = Telegram(
-            api_id=self.api_id,
-            api_hash=self.api_hash,
-            phone=self.phone,
-            database_encryption_key=self.encryption_key,
-            files_directory='tdlib_data',
+            api_id=self.cfg.api_id,
+            api_hash=self.cfg.api_hash,
+            phone=self.cfg.phone,
+            database_encryption_key=self.cfg.encryption_key,
+            files_directory=str(files_directory),
         )
 
         # Register event handlers
+        self._start_loop()
         self._register_handlers()
 
         logger.info("Client initialized successfully")
 
+    def _install_fast_json(self):
+        """Route TDLib request/update (de)serialization through orjson"""
+        if not _use_orjson():
+            return
+
+        # tdjson only uses json.dumps(query) and json.loads(result)
+        from telegram import tdjson
+        tdjson.json = SimpleNamespace(dumps=_json_dumps, loads=_json_loads)
+        logger.info("Using orjson for TDLib updates")
+
+    def _start_loop(self):
+        """Run the client's event loop on its own thread"""
+        # python-telegram calls handlers synchronously from its worker thread,
+        # so they are handed over to this loop instead of being awaited there.
+        # The loop thread is the only one touching the write and delete queues.
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever, name='jirgram-loop', daemon=True
+        )
+        self._loop_thread.start()
+
+    def _from_worker(self, handler):
+        """Wrap an async handler so python-telegram's worker thread can call it"""
+        loop = self._loop
+
+        def submit(update):
+            loop.call_soon_threadsafe(self._spawn, handler(update))
+
+        return submit
+
     def _register_handlers(self):
         """Register all event handlers"""
-        self.tg.add_message_handler(self.handle_new_message)
-        self.tg.add_update_handler('updateDeleteMessages', self.handle_delete_message)
-        self.tg.add_update_handler('updateMessageEdited', self.handle_edit_message)
+        handle_new_message = self._from_worker(self.handle_new_message)
+        dispatch = dict.fromkeys(_NEW_MSG_TYPES, handle_new_message)
+        dispatch['updateMessageEdited'] = self._from_worker(self.handle_edit_message)
+
+        # Config is frozen, so the anti-delete check is resolved here once
+        # instead of on every deletion update
+        if self.cfg.save_deleted:
+            dispatch['updateDeleteMessages'] = self._from_worker(self.handle_delete_message)
+
+        if self.cfg.ghost_mode:
+            dispatch['updateUserStatus'] = self.ghost_handler.handle_status_update
 
-        if self.ghost_mode_enabled:
-            self.tg.add_update_handler('updateUserStatus', self.ghost_handler.handle_status_update)
+        # python-telegram already keys its handler lists by @type, so each
+        # update reaches only the handler registered for its type
+        for update_type, handler in dispatch.items():
+            self.tg.add_update_handler(update_type, handler)
 
+    @_timed
     async def handle_new_message(self, update):
         """Handle incoming messages"""
-        if update.get('@type') == 'updateNewMessage':
-            message = update.get('message', {})
-
-            # Save message for anti-delete
-            if self.save_deleted:
-                await self.anti_delete_handler.save_message(message)
+        if _GET_TYPE(update) in _NEW_MSG_TYPES:
+            message = _GET_MSG(update)
+
+            # Queue message for anti-delete, written in batches
+            cfg = self.cfg
+            chat_id = message['chat_id']
+            if (cfg.save_deleted and chat_id not in cfg.ignored_chats
+                    and (not cfg.only_chats or chat_id in cfg.only_chats)):
+                pending = self._pending_saves
+                pending.append(message)
+                if self._flush_task is None:
+                    self._flush_task = self._spawn(self._periodic_flush())
+                if len(pending) >= BATCH_SIZE:
+                    self._spawn(self._flush_pending())
 
             # Log message (optional, can be disabled)
-            chat_id = message.get('chat_id')
-            text = self._extract_text(message)
-            logger.debug(f"New message in chat {chat_id}: {text[:50]}")
-
+            if logger.isEnabledFor(logging.DEBUG):
+                text = self._extract_text(message)
+                logger.debug("New message in chat %s: %.50s", chat_id, text)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """Start a background task and keep a reference until it finishes"""
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        """Forget a finished background task and report a failed one"""
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            e = task.exception()
+            logger.error(f"Background task failed: {e}", exc_info=e)
+
+    async def _flush_pending(self):
+        """Write all queued messages in one batch and wait until every batch is committed"""
+        if self._pending_saves:
+            from concurrent.futures.process import BrokenProcessPool
+
+            batch, self._pending_saves = self._pending_saves, []
+            pool = self._db_pool
+            try:
+                future = self._loop.run_in_executor(pool, _db_worker_save, _json_dumps(batch))
+            except (BrokenProcessPool, RuntimeError) as e:
+                # Broken or shut down pool: keep the batch for the next flush
+                logger.error(f"Failed to submit {len(batch)} messages: {e}")
+                self._pending_saves[:0] = batch
+                self._replace_db_pool(pool, e)
+            else:
+                self._inflight.add(future)
+                future.add_done_callback(functools.partial(self._batch_done, pool, len(batch)))
+
+        # Earlier batches may still be committing in the writer process
+        if self._inflight:
+            await asyncio.wait(list(self._inflight))
+
+    def _batch_done(self, pool, size: int, future: asyncio.Future):
+        """Forget a committed batch and report a failed one"""
+        self._inflight.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            e = future.exception()
+            logger.error(f"Failed to save {size} messages: {e}", exc_info=e)
+            self._replace_db_pool(pool, e)
+
+    def _replace_db_pool(self, pool, error: BaseException):
+        """Restart the writer process if it died under the given pool"""
+        from concurrent.futures.process import BrokenProcessPool
+
+        # Every batch in flight fails with the same error; restart only once
+        if isinstance(error, BrokenProcessPool) and pool is self._db_pool:
+            logger.warning("Database writer process died, restarting it")
+            pool.shutdown(wait=False)
+            self._db_pool = self._new_db_pool()
+
+    async def _periodic_flush(self):
+        """Flush queued messages every FLUSH_INTERVAL seconds"""
+        while self.is_running:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self._flush_pending()
+            except Exception as e:
+                logger.error(f"Periodic flush failed: {e}", exc_info=True)
+
+    @_timed
     async def handle_delete_message(self, update):
-        """Handle message deletion"""
-        if self.save_deleted:
-            await self.anti_delete_handler.handle_deletion(update)
-
+        """Handle message deletion (registered only with anti-delete enabled)"""
+        key = (update.get('chat_id'), update.get('is_permanent'), update.get('from_cache'))
+        self._pending_deletes.setdefault(key, []).extend(update.get('message_ids', ()))
+
+        if self._delete_flush_handle is None:
+            self._delete_flush_handle = self._loop.call_later(
+                DELETE_DEBOUNCE, lambda: self._spawn(self._flush_deletes())
+            )
+
+    async def _flush_deletes(self):
+        """Apply coalesced deletions, one handler call per chat"""
+        self._delete_flush_handle = None
+        pending, self._pending_deletes = self._pending_deletes, {}
+
+        # Deleted messages may still be sitting in the write queue. If they
+        # can't be written, the deletions are still recorded for what is saved.
+        try:
+            await self._flush_pending()
+        except Exception as e:
+            logger.error(f"Failed to write queued messages before deletion: {e}", exc_info=True)
+
+        for (chat_id, is_permanent, from_cache), message_ids in pending.items():
+            try:
+                await self.anti_delete_handler.handle_deletion({
+                    '@type': 'updateDeleteMessages',
+                    'chat_id': chat_id,
+                    'message_ids': message_ids,
+                    'is_permanent': is_permanent,
+                    'from_cache': from_cache,
+                })
+            except Exception as e:
+                logger.error(f"Failed to handle deletion in chat {chat_id}: {e}", exc_info=True)
+
+    async def _drain(self):
+        """Finish background tasks and write everything still queued"""
+        self._lag_monitor.stop()
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        if self._delete_flush_handle is not None:
+            self._delete_flush_handle.cancel()
+
+        # Finishing tasks may start new ones (a size-triggered flush)
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        # Flushes queued saves first, then applies queued deletions
+        await self._flush_deletes()
+
+    @_timed
     async def handle_edit_message(self, update):
         """Handle message edits"""
+        # The original may still be queued; this is a no-op when nothing is
+        await self._flush_pending()
         await self.history_handler.handle_edit(update, self.tg)
 
     def _extract_text(self, message: dict) -> str:
         """Extract text content from message"""
-        content = message.get('content', {})
+        content = _GET_CONTENT(message)
+        content_type = _GET_TYPE(content)
 
-        if content.get('@type') == 'messageText':
-            return content.get('text', {}).get('text', '')
+        extractor = _EXTRACTORS.get(content_type)
+        if extractor is not None:
+            return extractor(content)
 
-        return f"[{content.get('@type', 'Unknown')}]"
+        return _TYPE_FMT.format(content_type)
 
     async def send_message(self, chat_id: int, text: str, silent: bool = False):
         """Send a message"""
-        result = await self.tg.call_method('sendMessage', {
+        # A nested dict literal is built in one pass by the interpreter and is
+        # cheaper than copying a pre-built template
+        return await self.tg.call_method('sendMessage', {
             'chat_id': chat_id,
             'input_message_content': {
                 '@type': 'inputMessageText',
@@ -141,11 +713,9 @@ class JirgramClient:
                     'text': text
                 }
             },
-            'disable_notification': silent or self.ghost_mode_enabled
+            'disable_notification': silent or self.cfg.ghost_mode
         })
 
-        return result
-
     async def get_deleted_messages(self, chat_id: int):
         """Get all deleted messages from a chat"""
         return await self.anti_delete_handler.get_deleted_messages(chat_id)
@@ -159,11 +729,11 @@ class JirgramClient:
         logger.info("="*70)
         logger.info("🔥 jirgram Client Starting...")
         logger.info("="*70)
-        logger.info(f"👻 Ghost Mode: {self.ghost_mode_enabled}")
-        logger.info(f"   - Hide Online: {self.hide_online}")
-        logger.info(f"   - Hide Typing: {self.hide_typing}")
-        logger.info(f"   - Hide Read: {self.hide_read}")
-        logger.info(f"🛡️  Anti-Delete: {self.save_deleted}")
+        logger.info(f"👻 Ghost Mode: {self.cfg.ghost_mode}")
+        logger.info(f"   - Hide Online: {self.cfg.hide_online}")
+        logger.info(f"   - Hide Typing: {self.cfg.hide_typing}")
+        logger.info(f"   - Hide Read: {self.cfg.hide_read}")
+        logger.info(f"🛡️  Anti-Delete: {self.cfg.save_deleted}")
         logger.info("="*70)
 
         self.is_running = True
@@ -171,12 +741,31 @@ class JirgramClient:
         self.tg.idle()
 
     def stop(self):
-        """Stop the client"""
+        """Stop the client (call from outside the event loop thread)"""
         logger.info("Stopping jirgram client...")
         self.is_running = False
+
+        # Joins python-telegram's worker thread, so no handler is submitted
+        # after this. A no-op when idle() already stopped it on a signal.
         if self.tg:
             self.tg.stop()
 
+        # Messages and deletions are only queued from handlers, so without a
+        # loop there is nothing to write
+        loop = self._loop
+        if loop is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._drain(), loop).result()
+            except Exception as e:
+                logger.error(f"Failed to write queued messages: {e}", exc_info=True)
+            loop.call_soon_threadsafe(loop.stop)
+            self._loop_thread.join()
+            loop.close()
+            self._loop = None
+        self._db_pool.shutdown()
+
+        _stop_logging()
+
 
 def check_configuration():
     """
@@ -226,18 +815,35 @@ def main():
         print_setup_instructions()
         return
 
-    # Initialize and run client
+    # Only here, not at import: spawned writer processes import this module
+    # too and must not start a listener of their own
+    _setup_logging()
+
+    # Use libuv event loop when available, default asyncio loop otherwise.
+    # Set before the client is created: its handler loop comes from
+    # asyncio.new_event_loop() in init_client().
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("Using uvloop event loop")
+    except ImportError:
+        pass
+
+    # Initialize and run client. run() also returns normally once idle()
+    # has handled SIGINT/SIGTERM, so queued messages are written in finally.
+    client = None
     try:
         client = JirgramClient()
         client.init_client()
         client.run()
     except KeyboardInterrupt:
         logger.info("\nReceived interrupt signal, shutting down...")
-        if 'client' in locals():
-            client.stop()
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        if client is not None:
+            client.stop()
 
 
 if __name__ == '__main__':